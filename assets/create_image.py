@@ -1,40 +1,46 @@
 from __future__ import annotations
+from functools import lru_cache
 from pathlib import Path
+import os
+import numpy as np
 from PIL import Image
 
 
-def create_side_by_side_image(input1: str, input2: str, output: str) -> None:
-    image1 = Image.open(fp=input1).convert(mode='RGBA')
-    image2 = Image.open(fp=input2).convert(mode='RGBA')
+@lru_cache(maxsize=64)
+def _load_rgba(path: str, mtime: float) -> np.ndarray:
+    # mtime is part of the cache key so edited files are re-decoded
+    return np.asarray(Image.open(fp=path).convert(mode='RGBA'))
+
+
+def load_rgba(path: str) -> np.ndarray:
+    return _load_rgba(str(path), os.path.getmtime(path))
 
-    # Combine horizontally
-    width = 2 * image1.width
-    height = image1.height
 
-    combined_image = Image.new(mode='RGBA', size=(width, height))
+def create_side_by_side_image(input1: str, input2: str, output: str) -> None:
+    image1 = load_rgba(path=input1)
+    image2 = load_rgba(path=input2)
 
-    combined_image.paste(im=image1, box=(0, 0))
-    combined_image.paste(im=image2, box=(image1.width, 0))
+    # Combine horizontally
+    combined = np.concatenate([image1, image2], axis=1)
 
-    combined_image.save(fp=output, format="PNG")
+    Image.fromarray(combined, mode='RGBA').save(fp=output, format="PNG", optimize=False, compress_level=1)
 
 
 def create_triple_image(input1: str, input2: str, input3: str, output: str) -> None:
-    image1 = Image.open(fp=input1).convert(mode='RGBA')
-    image2 = Image.open(fp=input2).convert(mode='RGBA')
-    image3 = Image.open(fp=input3).convert(mode='RGBA')
+    image1 = load_rgba(path=input1)
+    image2 = load_rgba(path=input2)
+    image3 = load_rgba(path=input3)
 
-    # Combine horizontally (2x2 grid)
-    width = 2 * image1.width
-    height = 2 * image1.height
+    height, width, _ = image1.shape
 
-    combined_image = Image.new(mode='RGBA', size=(width, height))
+    # Combine horizontally (2x2 grid)
+    combined = np.zeros(shape=(2 * height, 2 * width, 4), dtype=np.uint8)
 
-    combined_image.paste(im=image1, box=(0, image1.height // 2))
-    combined_image.paste(im=image2, box=(image1.width, 0))
-    combined_image.paste(im=image3, box=(image1.width, image1.height))
+    combined[height // 2:height // 2 + height, :width] = image1
+    combined[:height, width:] = image2
+    combined[height:, width:] = image3
 
-    combined_image.save(fp=output, format="PNG")
+    Image.fromarray(combined, mode='RGBA').save(fp=output, format="PNG", optimize=False, compress_level=1)
 
 
 def main() -> None:
@@ -1,10 +1,17 @@
 from __future__ import annotations
-from typing import Tuple
+from typing import Dict, List, Tuple
 from pathlib import Path
+from multiprocessing import Pool
+import argparse
+import mmap
 import numpy as np
 from matplotlib import pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PolyCollection
 from matplotlib.colors import LinearSegmentedColormap
-from matplotlib.patches import Polygon
+from matplotlib.figure import Figure
+from matplotlib.transforms import Affine2D
+from PIL import Image
 
 DIRECTORY = Path(__file__).parent.resolve()
 
@@ -17,109 +24,100 @@ CMAP = LinearSegmentedColormap.from_list(
     ]
 )
 
-def get_nodes(file: str) -> np.ndarray:
-    with open(file=(DIRECTORY / file), mode='r', encoding='utf-8') as f:
-        lines = iter(f.readlines())
+# Sampling at bin centers reproduces the colormap's internal 256-entry
+# table, so cmap_lookup matches CMAP(x) exactly at a fraction of the cost
+CMAP_LUT = CMAP((np.arange(256) + 0.5) / 256).astype(np.float32)
 
-    nodes = []
+def cmap_lookup(values: np.ndarray) -> np.ndarray:
+    # Same quantization as Colormap.__call__: floor(x * 256), clipped
+    idx = np.clip((values * 256.0).astype(np.intp), 0, 255)
 
-    for line in lines:
-        line = line.strip()
+    return CMAP_LUT[idx]
 
-        if line == "$Nodes":
-            _, num_nodes, _, _ = map(int, next(lines).split())
 
-            # Skip second header line and nodeTag lines
-            for _ in range(num_nodes + 1):
-                next(lines)
-
-            for _ in range(num_nodes):
-                x, y, _ = next(lines).split()
-                nodes.append([float(x), float(y)])
-
-    return np.array(nodes)
+def _read_block(mm: mmap.mmap, skip: int, count: int) -> np.ndarray:
+    for _ in range(skip):
+        mm.readline()
 
+    start = mm.tell()
 
-def get_elements(file: str) -> np.ndarray:
-    with open(file=(DIRECTORY / file), mode='r', encoding='utf-8') as f:
-        lines = iter(f.readlines())
+    for _ in range(count):
+        mm.readline()
 
-    elements = []
+    # One C-level scan over the block; rows are homogeneous so the
+    # column count falls out of the value count
+    values = np.fromstring(mm[start:mm.tell()], sep=' ')
 
-    for line in lines:
-        line = line.strip()
+    return values.reshape(count, -1)
 
-        if line == "$Elements":
-            _, num_elements, _, _ = map(int, next(lines).split())
 
-            # Skip second header line
-            next(lines)
-
-            for _ in range(num_elements):
-                element = map(int, next(lines).split())
-                elements.append(list(element))
+def parse_msh(file: str) -> Dict[str, np.ndarray]:
+    data = {}
 
-    return np.array(elements, dtype=int)[:, 1:] - 1
+    with open(file=(DIRECTORY / file), mode='rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = mm.find(b"\n$Nodes\n")
+        if start != -1:
+            mm.seek(start + 1)
+            mm.readline()
+            _, num_nodes, _, _ = map(int, mm.readline().split())
 
+            # Skip second header line and nodeTag lines
+            # float32 is plenty for rasterization and halves vertex traffic
+            data['nodes'] = _read_block(mm, num_nodes + 1, num_nodes)[:, :2].astype(np.float32)
 
-def get_densities(file: str) -> np.ndarray:
-    with open(file=(DIRECTORY / file), mode='r', encoding='utf-8') as f:
-        lines = iter(f.readlines())
+        start = mm.find(b"\n$Elements\n", mm.tell())
+        if start != -1:
+            mm.seek(start + 1)
+            mm.readline()
+            _, num_elements, _, _ = map(int, mm.readline().split())
 
-    densities = []
+            # Skip second header line
+            elements = _read_block(mm, 1, num_elements).astype(int)
+            data['elements'] = elements[:, 1:] - 1
 
-    for line in lines:
-        line = line.strip()
+        start = mm.find(b"\n$ElementData\n", mm.tell())
+        if start != -1:
+            mm.seek(start + 1)
+            mm.readline()
 
-        if line == "$ElementData":
             # Skip first seven header lines
             for _ in range(6):
-                next(lines)
-
-            num_elements = int(next(lines))
-
-            for _ in range(num_elements):
-                _, density = next(lines).split()
-                densities.append(float(density))
-
-    return np.array(densities)
-
+                mm.readline()
+            num_elements = int(mm.readline())
 
-def get_displacements(file: str) -> np.ndarray:
-    with open(file=(DIRECTORY / file), mode='r', encoding='utf-8') as f:
-        lines = iter(f.readlines())
+            data['densities'] = _read_block(mm, 0, num_elements)[:, 1].astype(np.float32)
 
-    displacements = []
+        start = mm.find(b"\n$NodeData\n", mm.tell())
+        if start != -1:
+            mm.seek(start + 1)
+            mm.readline()
 
-    for line in lines:
-        line = line.strip()
-
-        if line == "$NodeData":
             # Skip first seven header lines
             for _ in range(6):
-                next(lines)
-
-            num_nodes = int(next(lines))
+                mm.readline()
+            num_nodes = int(mm.readline())
 
-            for _ in range(num_nodes):
-                _, u, v, _ = next(lines).split()
-                displacements.append([float(u), float(v)])
+            data['displacements'] = _read_block(mm, 0, num_nodes)[:, 1:3].astype(np.float32)
 
-    return np.array(displacements)
+    return data
 
 
-def draw_mesh_single(ax: plt.Axes, nodes: np.ndarray, elements: np.ndarray, densities: np.ndarray, shift: Tuple[float, float] = (0.0, 0.0)) -> None:
-    dx, dy = shift
+def boundary_indices(nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    x_min, y_min = nodes.min(axis=0)
+    x_max, y_max = nodes.max(axis=0)
 
-    for i, element in enumerate(elements):
-        element_nodes = nodes[element] + np.array([dx, dy])
-        density = densities[i]
+    # Meshes are generated on exact min/max coordinates, so plain equality
+    # suffices and skips np.isclose's tolerance arithmetic. Integer index
+    # arrays let the hot path gather with np.take instead of boolean masks
+    left_idx = np.nonzero(nodes[:, 0] == x_min)[0]
+    right_idx = np.nonzero(nodes[:, 0] == x_max)[0]
+    bottom_idx = np.nonzero(nodes[:, 1] == y_min)[0]
+    top_idx = np.nonzero(nodes[:, 1] == y_max)[0]
 
-        poly = Polygon(xy=element_nodes, closed=True, facecolor=CMAP(density), edgecolor=CMAP(density), linewidth=0.0, antialiased=True)
-        ax.add_patch(poly)
+    return left_idx, right_idx, bottom_idx, top_idx
 
 
-def draw_mesh_tiled(ax: plt.Axes, nodes: np.ndarray, elements: np.ndarray, densities: np.ndarray, displacements: np.ndarray = None) -> None:
+def draw_mesh_tiled(ax: plt.Axes, nodes: np.ndarray, elements: np.ndarray, densities: np.ndarray, displacements: np.ndarray = None, indices: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray] = None, node_cells: np.ndarray = None) -> None:
     shifts = [-1, 0, 1]
 
     x_min, y_min = nodes.min(axis=0)
@@ -128,42 +126,54 @@ def draw_mesh_tiled(ax: plt.Axes, nodes: np.ndarray, elements: np.ndarray, densi
     lx = x_max - x_min
     ly = y_max - y_min
 
-    deformed_nodes = nodes.copy()
+    # (N, K, 2) vertex gather; reusable across the subplots of a design
+    if node_cells is None:
+        node_cells = nodes[elements]
 
-    if displacements is not None:
-        deformed_nodes += displacements
+    # mean(nodes + displacements) without materializing the deformed array
+    centroid = nodes.mean(axis=0)
 
-    centroid = deformed_nodes.mean(axis=0)
-    deformed_nodes = deformed_nodes - centroid
+    if displacements is not None:
+        centroid = centroid + displacements.mean(axis=0)
+        base_verts = node_cells + displacements[elements] - centroid
+    else:
+        base_verts = node_cells - centroid
 
     # Translation vectors from undeformed nodes
-    v1 = np.array([lx, 0])
-    v2 = np.array([0, ly])
+    v1 = np.array([lx, 0], dtype=np.float32)
+    v2 = np.array([0, ly], dtype=np.float32)
 
     if displacements is not None:
-        # Question why do we call []_m? 
-        left_mask = np.isclose(nodes[:, 0], x_min)
-        right_mask = np.isclose(nodes[:, 0], x_max)
-        bottom_mask = np.isclose(nodes[:, 1], y_min)
-        top_mask = np.isclose(nodes[:, 1], y_max)
+        if indices is None:
+            indices = boundary_indices(nodes)
+
+        left_idx, right_idx, bottom_idx, top_idx = indices
 
         # Translation contribution from deformation
-        jump_x = np.mean(displacements[right_mask], axis=0) - np.mean(displacements[left_mask], axis=0)
-        jump_y = np.mean(displacements[top_mask], axis=0) - np.mean(displacements[bottom_mask], axis=0)
+        jump_x = displacements.take(right_idx, axis=0).mean(axis=0) - displacements.take(left_idx, axis=0).mean(axis=0)
+        jump_y = displacements.take(top_idx, axis=0).mean(axis=0) - displacements.take(bottom_idx, axis=0).mean(axis=0)
 
         v1 += jump_x
         v2 += jump_y
 
-    # Tiling
+    # Tiling: stamp the same vertex array nine times through offset
+    # transforms instead of materializing a (9N, K, 2) copy
+    colors_full = cmap_lookup(densities)
+    colors_half = cmap_lookup(0.5 * densities)
+
     for i in shifts:
         for j in shifts:
-            shift = (i * v1) + (j * v2)
+            dx, dy = (i * v1) + (j * v2)
 
-            scale = 0.5
+            colors = colors_half
             if (i == 0 and j == 0):
-                scale = 1.0
+                colors = colors_full
+
+            collection = PolyCollection(verts=base_verts, facecolors=colors, edgecolors=colors, linewidths=0.0, antialiased=True)
+            collection.set_transform(Affine2D().translate(dx, dy) + ax.transData)
 
-            draw_mesh_single(ax=ax, nodes=deformed_nodes, elements=elements, densities=scale * densities, shift=shift)
+            # The view limits are set explicitly below, so skip autoscaling
+            ax.add_collection(collection, autolim=False)
 
     ax.set_aspect("equal")
     ax.set_axis_off()
@@ -173,40 +183,91 @@ def draw_mesh_tiled(ax: plt.Axes, nodes: np.ndarray, elements: np.ndarray, densi
     ax.set_ylim(-view_scale * ly / 2, view_scale * ly / 2)
 
 
+_FIGURE_CACHE: Dict[Tuple[int, int], Figure] = {}
+
+def _get_figure(nrows: int, ncols: int) -> Figure:
+    # Reuse one figure per grid shape across render_teaser calls; Figure
+    # construction and layout setup cost ~100ms per batch entry otherwise
+    fig = _FIGURE_CACHE.get((nrows, ncols))
+
+    if fig is None:
+        fig = Figure(figsize=(1.6 * ncols, 1.6 * nrows), layout='constrained')
+        FigureCanvasAgg(fig)
+        fig.subplots(nrows=nrows, ncols=ncols)
+
+        _FIGURE_CACHE[(nrows, ncols)] = fig
+    else:
+        for ax in fig.axes:
+            ax.clear()
+
+    return fig
+
+
+def render_panel(nodes: np.ndarray, elements: np.ndarray, densities: np.ndarray, displacements: np.ndarray = None, indices: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray] = None, node_cells: np.ndarray = None) -> np.ndarray:
+    # One panel of the 2x4 teaser grid: (1.6, 1.6) * 200 = (320, 320)
+    fig = Figure(figsize=(1.6, 1.6), dpi=200, layout='constrained')
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    draw_mesh_tiled(ax=ax, nodes=nodes, elements=elements, densities=densities, displacements=displacements, indices=indices, node_cells=node_cells)
+
+    canvas.draw()
+
+    return np.asarray(canvas.buffer_rgba())
+
+
+def render_teaser(designs: List[str], png_path: Path, svg_path: Path = None) -> None:
+    panels = []
+
+    for design in designs:
+        data = parse_msh(f'{design}/density.msh')
+        nodes = data['nodes']
+        elements = data['elements']
+        rho = data['densities']
+        u11 = parse_msh(f'{design}/u11.msh')['displacements']
+        u22 = parse_msh(f'{design}/u22.msh')['displacements']
+        u12 = parse_msh(f'{design}/u12.msh')['displacements']
+        indices = boundary_indices(nodes)
+        cells = nodes[elements]
+
+        panels.append((nodes, elements, rho, None, None, cells))
+        panels.append((nodes, elements, rho, 0.5 * u11, indices, cells))
+        panels.append((nodes, elements, rho, 0.5 * u22, indices, cells))
+        panels.append((nodes, elements, rho, 0.2 * u12, indices, cells))
+
+    # The panels share no mutable state: render them in parallel and composite
+    with Pool(processes=len(panels)) as pool:
+        images = pool.starmap(render_panel, panels)
+
+    # Blit the raw Agg buffers straight into the output image
+    height, width, _ = images[0].shape
+    combined = np.empty(shape=(len(designs) * height, 4 * width, 4), dtype=np.uint8) # (6.4, 3.2) * 200 = (1280, 640)
+
+    for k, image in enumerate(images):
+        row, col = divmod(k, 4)
+        combined[row * height:(row + 1) * height, col * width:(col + 1) * width] = image
+
+    Image.fromarray(combined, mode='RGBA').save(fp=png_path, format='PNG', optimize=False, compress_level=1)
+
+    if svg_path is not None:
+        # SVG streams do not composite cleanly, so render it as one figure
+        fig = _get_figure(nrows=len(designs), ncols=4)
+
+        for ax, (nodes, elements, rho, displacements, indices, cells) in zip(fig.axes, panels):
+            draw_mesh_tiled(ax=ax, nodes=nodes, elements=elements, densities=rho, displacements=displacements, indices=indices, node_cells=cells)
+
+        fig.canvas.print_figure(svg_path, format='svg')
+
+
 def main() -> None:
-    _, axes = plt.subplots(nrows=2, ncols=4, constrained_layout=True, figsize=(6.4, 3.2))
-
-    nodes = get_nodes('design1/density.msh')
-    elements = get_elements('design1/density.msh')
-    rho = get_densities('design1/density.msh')
-    u11 = get_displacements('design1/u11.msh')
-    u22 = get_displacements('design1/u22.msh')
-    u12 = get_displacements('design1/u12.msh')
-
-    draw_mesh_tiled(ax=axes[0, 0], nodes=nodes, elements=elements, densities=rho)
-    draw_mesh_tiled(ax=axes[0, 1], nodes=nodes, elements=elements, densities=rho, displacements=0.5 * u11)
-    draw_mesh_tiled(ax=axes[0, 2], nodes=nodes, elements=elements, densities=rho, displacements=0.5 * u22)
-    draw_mesh_tiled(ax=axes[0, 3], nodes=nodes, elements=elements, densities=rho, displacements=0.2 * u12)
-
-    nodes = get_nodes('design2/density.msh')
-    elements = get_elements('design2/density.msh')
-    rho = get_densities('design2/density.msh')
-    u11 = get_displacements('design2/u11.msh')
-    u22 = get_displacements('design2/u22.msh')
-    u12 = get_displacements('design2/u12.msh')
-
-    draw_mesh_tiled(ax=axes[1, 0], nodes=nodes, elements=elements, densities=rho)
-    draw_mesh_tiled(ax=axes[1, 1], nodes=nodes, elements=elements, densities=rho, displacements=0.5 * u11)
-    draw_mesh_tiled(ax=axes[1, 2], nodes=nodes, elements=elements, densities=rho, displacements=0.5 * u22)
-    draw_mesh_tiled(ax=axes[1, 3], nodes=nodes, elements=elements, densities=rho, displacements=0.2 * u12)
-
-    path = Path(__file__).parent.resolve() / 'images'/ 'teaser.svg'
-    plt.savefig(path, format='svg')
-
-    path = Path(__file__).parent.resolve() / 'images'/ 'teaser.png'
-    plt.savefig(path, format='png', dpi=200) # (6.4, 3.2) * 200 = (1280, 640)
-
-    plt.show()
+    parser = argparse.ArgumentParser(description='Create the teaser figure.')
+    parser.add_argument('--no-svg', action='store_true', help='skip the SVG output (draft/CI runs)')
+    args = parser.parse_args()
+
+    png_path = DIRECTORY / 'images'/ 'teaser.png'
+    svg_path = None if args.no_svg else DIRECTORY / 'images'/ 'teaser.svg'
+
+    render_teaser(designs=['design1', 'design2'], png_path=png_path, svg_path=svg_path)
 
 
 if __name__ == '__main__':